@@ -3,23 +3,53 @@ F1 Telemetry Analytics Dashboard
 A comprehensive Streamlit application for visualizing Formula 1 telemetry data.
 """
 import os
+import time
+import pickle
+import logging
+import tempfile
 import fastf1
 
-os.makedirs(".fastf1_cache", exist_ok=True)
-fastf1.Cache.enable_cache(".fastf1_cache")
+# Single FastF1 cache directory; point FASTF1_CACHE at fast local storage (NVMe/tmpfs) for quicker cold loads
+CACHE_DIR = os.environ.get("FASTF1_CACHE", ".fastf1_cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+fastf1.Cache.enable_cache(CACHE_DIR)
 
 import streamlit as st
-import fastf1
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
+from plotly.colors import sequential
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 
+from telemetry_utils import clean_telemetry
+
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger(__name__)
+
+# FastF1's exception classes live in fastf1.exceptions in newer releases
+try:
+    from fastf1 import exceptions as fastf1_errors
+except ImportError:
+    fastf1_errors = fastf1.core
+
+# Errors that mean the requested data is unavailable (network, missing race/driver/laps).
+# Anything else is a bug and should surface with a traceback instead of being swallowed.
+# Our own on-disk caches (e.g. the schedule pickles) treat read/write failures as misses instead
+LOAD_ERRORS = (
+    OSError,  # includes ConnectionError, TimeoutError and requests' exceptions
+    ValueError,
+    KeyError,
+    AttributeError,
+    RuntimeError,  # FastF1's rate-limit error
+    fastf1_errors.DataNotLoadedError,
+    fastf1_errors.NoLapDataError,
+    getattr(fastf1_errors, 'InvalidSessionError', ValueError),
+)
+
 # Page configuration
 st.set_page_config(
     page_title="F1 Telemetry Analytics",
@@ -48,8 +78,8 @@ st.markdown("""
 # Initialize session state
 if 'race_data' not in st.session_state:
     st.session_state.race_data = None
-if 'qualifying_data' not in st.session_state:
-    st.session_state.qualifying_data = None
+if 'race_round' not in st.session_state:
+    st.session_state.race_round = None
 
 
 def get_available_years():
@@ -59,14 +89,103 @@ def get_available_years():
     return list(range(2018, current_year + 1))
 
 
+# Schedules on disk older than this are fetched again (seasons can be rescheduled)
+SCHEDULE_MAX_AGE = 86400
+
+
+def _read_cached_schedule(path):
+    """Return the schedule pickled at path if it's fresh, otherwise None"""
+    try:
+        if time.time() - os.path.getmtime(path) >= SCHEDULE_MAX_AGE:
+            return None
+        return pd.read_pickle(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, ImportError, AttributeError, TypeError, ValueError):
+        # Truncated/empty file, or pickled by a different pandas/FastF1 version: treat it as a miss
+        logger.debug("Discarding unreadable schedule cache %s", path, exc_info=True)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+
+def _write_cached_schedule(schedule, path):
+    """Pickle the schedule to path atomically, so readers never see a half-written file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".schedule_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            schedule.to_pickle(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@st.cache_data(ttl=SCHEDULE_MAX_AGE, show_spinner=False)
 def get_race_schedule(year):
     """Fetch and return the race schedule for a given year"""
+    path = os.path.join(CACHE_DIR, f"schedule_{year}.pkl")
+    # The on-disk copy handles its own failures as cache misses; LOAD_ERRORS only covers the fetch
+    schedule = _read_cached_schedule(path)
+    if schedule is not None:
+        return schedule
+    
     try:
         schedule = fastf1.get_event_schedule(year)
-        return schedule
-    except Exception as e:
+    except LOAD_ERRORS as e:
+        logger.debug("Schedule fetch for %s failed", year, exc_info=True)
         st.error(f"Error fetching schedule for {year}: {str(e)}")
         return None
+    
+    try:
+        _write_cached_schedule(schedule, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        # A read-only cache directory or an unpicklable schedule only costs us the cold-start shortcut
+        logger.debug("Could not write schedule cache %s", path, exc_info=True)
+    return schedule
+
+
+@st.cache_data(ttl=SCHEDULE_MAX_AGE, show_spinner=False)
+def get_race_options(year):
+    """Build the race selectbox options: (display names, {display name: round number}) or None"""
+    schedule = get_race_schedule(year)
+    if schedule is None or len(schedule) == 0:
+        return None
+    
+    race_display = ("Round " + schedule['RoundNumber'].astype(str) + ": " +
+                    schedule['Location'] + " (" + schedule['EventName'] + ")").tolist()
+    return race_display, dict(zip(race_display, schedule['RoundNumber'].tolist()))
+
+
+# A weekend's qualifying + race both stay resident; least recently used sessions get evicted past this
+SESSION_POOL_SIZE = 8
+
+# Cached fastest-lap telemetry frames: a full grid's worth per pooled session, with room for
+# the X/Y-only copies the comparison plots keep alongside the full-channel ones
+TELEMETRY_CACHE_SIZE = SESSION_POOL_SIZE * 20
+
+
+@st.cache_resource(max_entries=SESSION_POOL_SIZE, show_spinner=False)
+def _load_session(year, race_name_or_round, session_type):
+    """Load a FastF1 session once and keep it in memory across reruns"""
+    # Try to load by round number first
+    if str(race_name_or_round).isdigit():
+        session = fastf1.get_session(year, int(race_name_or_round), session_type)
+    else:
+        # Load by location name
+        session = fastf1.get_session(year, race_name_or_round, session_type)
+    
+    session.load()
+    # load() only logs most network/parse failures, which would leave a half-loaded session
+    # cached for everyone. Without laps nothing works, so touching them raises DataNotLoadedError
+    # instead; a missing telemetry feed only affects the track maps, which report it themselves
+    session.laps
+    return session
 
 
 def load_race_session(year, race_name_or_round, session_type='R'):
@@ -82,74 +201,364 @@ def load_race_session(year, race_name_or_round, session_type='R'):
     - Session object or None if error
     """
     try:
-        # Try to load by round number first
-        if str(race_name_or_round).isdigit():
-            round_num = int(race_name_or_round)
-            session = fastf1.get_session(year, round_num, session_type)
-        else:
-            # Load by location name
-            session = fastf1.get_session(year, race_name_or_round, session_type)
-        
-        session.load()
-        return session
-    except Exception as e:
+        # Failures (including laps that didn't load) raise out of the cached loader, so they are never cached
+        return _load_session(year, race_name_or_round, session_type)
+    except LOAD_ERRORS as e:
+        logger.debug("Loading %s %s %s failed", year, race_name_or_round, session_type, exc_info=True)
         st.error(f"Error loading {session_type} session: {str(e)}")
         return None
 
 
-def get_fastest_lap_telemetry(session, driver_code):
+# Timing columns FastF1 needs to merge and slice car/position data
+TELEMETRY_BASE_COLUMNS = ('Date', 'SessionTime', 'Time', 'Source')
+
+# Numeric channels stored as float32 once loaded
+FLOAT32_CHANNELS = ('X', 'Y', 'Z', 'Speed', 'Throttle', 'Brake', 'Distance', 'RPM')
+
+# Alternative (lower-case) names seen for channels that are renamed on load
+TELEMETRY_COLUMN_ALIASES = {
+    'Brake': ('brake', 'br'),
+    'DRS': ('drs',),
+}
+
+# One solid Plasma band per gear (1-8), so each gear gets its own color instead of a gradient
+GEAR_COLORS = [sequential.Plasma[i] for i in np.linspace(0, len(sequential.Plasma) - 1, 8).round().astype(int)]
+GEAR_COLORSCALE = [[edge / 8, color] for i, color in enumerate(GEAR_COLORS) for edge in (i, i + 1)]
+
+# color_by option -> (telemetry column, colorbar label, colorscale)
+COLOR_CHANNELS = {
+    "Speed": ('Speed', "Speed (km/h)", 'Viridis'),
+    "Throttle": ('Throttle', "Throttle (%)", 'Greens'),
+    "Brake": ('Brake', "Brake (%)", 'Reds'),
+    "Gear": ('nGear', "Gear", GEAR_COLORSCALE),
+    "DRS": ('DRS', "DRS", 'Blues'),
+}
+
+# Integer-valued color_by options -> fixed (cmin, cmax), or None to use the data range.
+# These are sent to the browser as small ints rather than rounded floats
+DISCRETE_CHANNELS = {
+    "Gear": (0.5, 8.5),  # centers gear N in the Nth band of GEAR_COLORSCALE
+    "DRS": None,
+}
+
+
+@st.cache_data(max_entries=SESSION_POOL_SIZE, show_spinner=False,
+               hash_funcs={fastf1.core.Session: lambda s: s.api_path})
+def get_fastest_lap_index(session):
+    """
+    Map every driver in a session to the index label of their fastest lap in session.laps
+    
+    Only index labels are cached: Lap objects hold a reference to their Session, which would
+    keep sessions evicted from the _load_session pool alive.
+    
+    Parameters:
+    - session: FastF1 session object
+    
+    Returns:
+    - Dict of driver abbreviation and driver number (both as str) -> session.laps index label
+      (drivers without a valid lap are left out)
+    """
+    laps = session.laps
+    # Same rule as Laps.pick_fastest(): only laps marked as personal best count,
+    # but done in one groupby pass instead of a pick_driver() scan per driver
+    valid = laps.loc[(laps['IsPersonalBest'] == True) & laps['LapTime'].notna()]  # noqa: E712
+    fastest_idx = valid.groupby('Driver')['LapTime'].idxmin()
+    index = fastest_idx.to_dict()
+    # pick_driver() also takes driver numbers ("44"), so keep accepting those
+    numbers = laps.loc[fastest_idx.to_numpy(), 'DriverNumber'].astype(str)
+    index.update(zip(numbers, fastest_idx.tolist()))
+    return index
+
+
+def get_fastest_lap(session, driver_code):
+    """Fastest lap of a driver as a FastF1 Lap bound to this session, or None"""
+    idx = get_fastest_lap_index(session).get(str(driver_code))
+    if idx is None:
+        return None
+    return session.laps.loc[idx]
+
+
+@st.cache_data(ttl=3600, max_entries=TELEMETRY_CACHE_SIZE, show_spinner=False,
+               hash_funcs={fastf1.core.Session: lambda s: s.api_path})
+def get_fastest_lap_telemetry(session, driver_code, channels=None):
     """
     Extract fastest lap telemetry for a given driver
     
     Parameters:
     - session: FastF1 session object
     - driver_code: Three-letter driver code (e.g., 'VER', 'HAM')
+    - channels: Optional tuple of channels to keep (e.g. ('X', 'Y')); Distance is always added
     
     Returns:
     - Telemetry DataFrame or None
     """
     try:
-        driver_laps = session.laps.pick_driver(driver_code)
-        if len(driver_laps) == 0:
+        fastest_lap = get_fastest_lap(session, driver_code)
+        if fastest_lap is None:
             return None
         
-        fastest_lap = driver_laps.pick_fastest()
-        telemetry = fastest_lap.get_telemetry()
+        # Same merge as Lap.get_telemetry(), minus the driver-ahead/relative-distance
+        # channels it also computes (which need every other driver's data)
+        car_data = fastest_lap.get_car_data(pad=1, pad_side='both')
+        pos_data = fastest_lap.get_pos_data(pad=1, pad_side='both')
+        if channels is not None:
+            # Speed is always needed to integrate Distance
+            keep = set(TELEMETRY_BASE_COLUMNS) | set(channels) | {'Speed'}
+            car_data = car_data[[col for col in car_data.columns if col in keep]]
+            pos_data = pos_data[[col for col in pos_data.columns if col in keep]]
+        
+        telemetry = pos_data.merge_channels(car_data)
+        telemetry = telemetry.slice_by_lap(fastest_lap, interpolate_edges=True)
+        telemetry = telemetry.add_distance()
         
         # Ensure telemetry has required columns
         if telemetry is None or len(telemetry) == 0:
             return None
         
+        # Normalize brake/DRS column names so plotting can rely on 'Brake' and 'DRS'
+        lower_map = {col.lower(): col for col in telemetry.columns}
+        renames = {}
+        for canonical, aliases in TELEMETRY_COLUMN_ALIASES.items():
+            if canonical in telemetry.columns:
+                continue
+            match = next((lower_map[alias] for alias in aliases if alias in lower_map), None)
+            if match is None:
+                # Fall back to any column containing the name (case insensitive)
+                match = next((col for lower, col in lower_map.items() if aliases[0] in lower), None)
+            if match is not None:
+                renames[match] = canonical
+        if renames:
+            telemetry = telemetry.rename(columns=renames)
+        
         # Normalize brake data if it exists (some sessions have boolean 0/1 instead of percentage)
         if 'Brake' in telemetry.columns:
-            # If brake values are only 0 and 1, convert to percentage (0-100)
-            if telemetry['Brake'].max() <= 1 and telemetry['Brake'].min() >= 0:
-                telemetry['Brake'] = telemetry['Brake'] * 100
+            brake = telemetry['Brake'].to_numpy()
+            # FastF1 reports brake as a boolean; only scan the values when it isn't
+            if brake.dtype == bool:
+                telemetry['Brake'] = np.multiply(brake, 100, dtype=np.float32)
+            else:
+                brake = brake.astype(float, copy=False)
+                # If brake values are only 0 and 1, convert to percentage (0-100)
+                if np.nanmax(brake) <= 1 and np.nanmin(brake) >= 0:
+                    telemetry['Brake'] = np.multiply(brake, 100, dtype=np.float32)
         
-        # Sort by distance to ensure proper line ordering
-        if 'Distance' in telemetry.columns:
-            telemetry = telemetry.sort_values('Distance').reset_index(drop=True)
+        # Sort by distance to ensure proper line ordering (telemetry usually arrives ordered already)
+        if 'Distance' in telemetry.columns and not telemetry['Distance'].is_monotonic_increasing:
+            telemetry = telemetry.sort_values('Distance', kind='stable').reset_index(drop=True)
         
-        return telemetry
-    except Exception as e:
+        # float32 is plenty for plotting and halves the memory each pass has to touch
+        for col in FLOAT32_CHANNELS:
+            if col in telemetry.columns:
+                telemetry[col] = telemetry[col].astype(np.float32, copy=False)
+        if 'nGear' in telemetry.columns and telemetry['nGear'].notna().all():
+            telemetry['nGear'] = telemetry['nGear'].astype(np.int8)
+        
+        # st.cache_data pickles the result on every store and hit. A FastF1 Telemetry frame
+        # carries its whole Session as metadata, so hand back a plain DataFrame instead
+        return pd.DataFrame(telemetry)
+    except LOAD_ERRORS as e:
+        logger.debug("Telemetry extraction for %s failed", driver_code, exc_info=True)
         st.error(f"Error extracting telemetry for {driver_code}: {str(e)}")
         return None
 
 
-def plot_racing_line_heatmap(telemetry, title="Racing Line Heatmap", color_by="Speed", height=900, width=900):
+def fetch_fastest_lap_telemetry(requests, channels=None):
+    """
+    Fetch fastest lap telemetry for several (session, driver_code) pairs concurrently
+    
+    Parameters:
+    - requests: List of (session, driver_code) tuples
+    - channels: Passed through to get_fastest_lap_telemetry
+    
+    Returns:
+    - List of telemetry DataFrames (or None), in request order
+    """
+    # Worker threads share this run's context so st.cache_data and any
+    # st.error calls inside the loader keep working
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=min(8, len(requests)),
+                            initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        return list(executor.map(lambda req: get_fastest_lap_telemetry(req[0], req[1], channels=channels), requests))
+
+
+# Upper bound on points sent to the browser per racing-line trace
+MAX_RACING_LINE_POINTS = 3000
+
+# Per-trace budget on plots that overlay several single-color racing lines
+MAX_OVERLAY_LINE_POINTS = 1500
+
+# Number of points carrying hover information on a racing-line heatmap
+HOVER_OVERLAY_POINTS = 300
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+    
+    Parameters:
+    - x: Monotonic x values (e.g. distance)
+    - y: Values to preserve the visual shape of
+    - n_out: Number of points to keep
+    
+    Returns:
+    - Sorted array of indices into x/y
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    # First and last points are always kept, the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        
+        # Keep the point forming the largest triangle with the previous pick and the next bucket average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    
+    return indices
+
+
+def racing_line_indices(x, y, color_values=None, distance=None, max_points=MAX_RACING_LINE_POINTS):
+    """
+    Pick the samples to plot for a racing line
+    
+    LTTB is run against X and Y (and the color channel, if given) separately and
+    the indices are merged, so corners and color changes are not smoothed away.
+    
+    Parameters:
+    - x, y: Position arrays, ordered along the lap
+    - color_values: Optional array of values used for color mapping
+    - distance: Optional distance array (defaults to the sample number)
+    - max_points: Approximate number of points to keep
+    
+    Returns:
+    - Sorted array of sample positions
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    
+    if distance is None:
+        distance = np.arange(n)
+    
+    channels = [x, y]
+    if color_values is not None:
+        channels.append(color_values)
+    
+    n_out = max_points // len(channels)
+    return np.unique(np.concatenate([lttb_indices(distance, values, n_out) for values in channels]))
+
+
+def to_plot_list(values, decimals=1):
+    """Round values and return a plain list, keeping the Plotly JSON sent to the browser small"""
+    # Round in float64, otherwise float32 values come back as e.g. 123.40000152587890
+    return np.round(np.asarray(values, dtype=np.float64), decimals).tolist()
+
+
+def scattergl(**kwargs):
+    """Build a Scattergl trace without Plotly's per-property schema validation"""
+    # Every trace here is built from our own arrays, so validating thousands of points
+    # on each rerun is wasted work (the figure still checks the trace when it's added)
+    return go.Scattergl(_validate=False, **kwargs)
+
+
+def downsample_racing_line(telemetry, max_points=MAX_OVERLAY_LINE_POINTS):
+    """Return the rows of a telemetry DataFrame worth plotting as a racing line"""
+    distance = telemetry['Distance'].to_numpy() if 'Distance' in telemetry.columns else None
+    keep_idx = racing_line_indices(telemetry['X'].to_numpy(), telemetry['Y'].to_numpy(),
+                                   distance=distance, max_points=max_points)
+    return telemetry.iloc[keep_idx]
+
+
+def prepare_telemetry(telemetry):
+    """
+    Extract the position data of a lap once so several heatmaps can share it
+    
+    Parameters:
+    - telemetry: DataFrame with X and Y data, sorted by distance
+    
+    Returns:
+    - Dict with x, y and distance arrays, plus idx: the telemetry rows they came from (array or slice)
+    """
+    x = telemetry['X'].to_numpy(dtype=np.float32)
+    y = telemetry['Y'].to_numpy(dtype=np.float32)
+    if 'Distance' in telemetry.columns:
+        d = telemetry['Distance'].to_numpy(dtype=np.float32)
+    else:
+        d = np.arange(len(telemetry), dtype=np.float32)
+    
+    valid_mask = np.isfinite(x)
+    valid_mask &= np.isfinite(y)
+    if valid_mask.all():
+        # Common case: no gaps, so hand the arrays over as they are
+        return dict(x=x, y=y, distance=d, idx=slice(None))
+    
+    idx = np.flatnonzero(valid_mask)
+    return dict(x=x[idx], y=y[idx], distance=d[idx], idx=idx)
+
+
+def plot_racing_line_heatmap(telemetry, title="Racing Line Heatmap", color_by="Speed", height=900, width=900, prepared=None, hover=True):
     """
     Create a racing line heatmap visualization with larger size
     
     Parameters:
     - telemetry: DataFrame with X, Y, and speed data
     - title: Plot title
-    - color_by: Column to use for color mapping ('Speed', 'Throttle', 'Brake', 'nGear')
+    - color_by: Channel to use for color mapping ('Speed', 'Throttle', 'Brake', 'Gear', 'DRS')
     - height: Plot height in pixels
     - width: Plot width in pixels
+    - prepared: Optional result of prepare_telemetry(telemetry), to reuse across channels
+    - hover: Show hover tooltips (disabled hover skips plotly.js hit-testing)
     
     Returns:
     - Plotly figure object
     """
+    if color_by not in COLOR_CHANNELS:
+        color_by = "Speed"
+    return plot_channel_heatmaps(telemetry, (color_by,), (title,), height=height, width=width, prepared=prepared, hover=hover)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_racing_line_heatmap(telemetry_key, title, color_by, height, width, hover, _telemetry, _prepared):
+    """
+    Cached plot_racing_line_heatmap, so unchanged maps aren't rebuilt on every rerun
+    
+    The telemetry itself isn't hashed; telemetry_key (session api_path, driver) identifies it.
+    """
+    return plot_racing_line_heatmap(_telemetry, title, color_by, height=height, width=width, prepared=_prepared, hover=hover)
+
+
+def plot_channel_heatmaps(telemetry, channels, titles, height=900, width=900, prepared=None, hover=True):
+    """
+    Racing line heatmap of one lap, with a dropdown to switch the color channel if there are several
+    
+    The lap is downsampled once on X/Y and drawn as a single marker trace, so the track
+    geometry is sent to the browser once; each dropdown entry only swaps the colors.
+    
+    Parameters:
+    - telemetry: DataFrame with X, Y and the channel columns
+    - channels: color_by options to offer (keys of COLOR_CHANNELS), first one shown initially
+    - titles: Plot title for each channel
+    - height: Plot height in pixels
+    - width: Plot width in pixels
+    - prepared: Optional result of prepare_telemetry(telemetry)
+    - hover: Show hover tooltips (disabled hover skips plotly.js hit-testing)
+    
+    Returns:
+    - Plotly figure object or None
+    """
     if telemetry is None or len(telemetry) == 0:
         return None
     
@@ -158,158 +567,221 @@ def plot_racing_line_heatmap(telemetry, title="Racing Line Heatmap", color_by="S
         st.error("Telemetry data missing X or Y coordinates")
         return None
     
-    # Determine color column with proper error handling
-    color_col = None
-    color_label = ""
-    colorscale = 'Viridis'
+    if prepared is None:
+        prepared = prepare_telemetry(telemetry)
     
-    if color_by == "Speed":
-        if 'Speed' not in telemetry.columns:
-            st.error("Speed data not available in telemetry")
-            return None
-        color_col = telemetry['Speed']
-        color_label = "Speed (km/h)"
-        colorscale = 'Viridis'
-    elif color_by == "Throttle":
-        if 'Throttle' not in telemetry.columns:
-            st.error("Throttle data not available in telemetry")
-            return None
-        color_col = telemetry['Throttle']
-        color_label = "Throttle (%)"
-        colorscale = 'Greens'
-    elif color_by == "Brake":
-        # Check for brake column with multiple possible names
-        brake_col = None
-        if 'Brake' in telemetry.columns:
-            brake_col = 'Brake'
-        elif 'BR' in telemetry.columns:
-            brake_col = 'BR'
-        else:
-            # Try to find any column with 'brake' in the name (case insensitive)
-            brake_cols = [col for col in telemetry.columns if 'brake' in col.lower()]
-            if brake_cols:
-                brake_col = brake_cols[0]
-        
-        if brake_col is None:
-            st.error("Brake data not available in telemetry. Available columns: " + ", ".join(telemetry.columns.tolist()[:10]))
-            return None
-        
-        color_col = telemetry[brake_col]
-        color_label = "Brake (%)"
-        colorscale = 'Reds'
-        
-        # Check if brake data is meaningful (not all zeros)
-        if color_col.max() == 0:
-            st.warning("Brake data appears to be all zeros. This might indicate the data source doesn't include brake telemetry for this session.")
-    elif color_by == "Gear":
-        if 'nGear' not in telemetry.columns:
-            st.error("Gear data not available in telemetry")
-            return None
-        color_col = telemetry['nGear']
-        color_label = "Gear"
-        colorscale = 'Plasma'
-    elif color_by == "DRS":
-        # Check for DRS column with multiple possible names
-        drs_col = None
-        if 'DRS' in telemetry.columns:
-            drs_col = 'DRS'
-        elif 'drs' in telemetry.columns:
-            drs_col = 'drs'
-        else:
-            # Try to find any column with 'drs' in the name (case insensitive)
-            drs_cols = [col for col in telemetry.columns if 'drs' in col.lower()]
-            if drs_cols:
-                drs_col = drs_cols[0]
-        
-        if drs_col is None:
-            st.error("DRS data not available in telemetry. Available columns: " + ", ".join(telemetry.columns.tolist()[:10]))
-            return None
-        
-        color_col = telemetry[drs_col]
-        color_label = "DRS"
-        colorscale = 'Blues'
-        
-        # Normalize DRS data if it's boolean (0/1) to percentage (0-100)
-        if color_col.max() <= 1 and color_col.min() >= 0:
-            color_col = color_col * 100
-        
-        # Check if DRS data is meaningful (not all zeros)
-        if color_col.max() == 0:
-            st.warning("DRS data appears to be all zeros. This might indicate the data source doesn't include DRS telemetry for this session.")
-    else:
-        if 'Speed' not in telemetry.columns:
-            st.error("Speed data not available in telemetry")
-            return None
-        color_col = telemetry['Speed']
-        color_label = "Speed (km/h)"
-        colorscale = 'Viridis'
-    
-    # Remove NaN values that could break the visualization
-    valid_mask = ~(pd.isna(telemetry['X']) | pd.isna(telemetry['Y']) | pd.isna(color_col))
-    if not valid_mask.any():
-        st.error(f"No valid data points available for {color_by} visualization")
+    channel_values = {}
+    for color_by, title in zip(channels, titles):
+        color_col = channel_color_column(telemetry, color_by)
+        if color_col is not None:
+            channel_values[color_by] = (color_col.to_numpy(dtype=np.float32)[prepared['idx']], title)
+    
+    if not channel_values:
         return None
     
-    # Filter and create clean dataframes
-    telemetry_clean = telemetry[valid_mask].copy()
-    color_col_clean = color_col[valid_mask].copy()
+    # Remove NaN values that could break the visualization. Every channel shares one geometry,
+    # so a sample is dropped if any channel is missing there: a NaN in any channel makes the sum NaN.
+    # The sample positions ride along in place of distance to pick the channel values afterwards
+    combined = np.sum([values for values, _ in channel_values.values()], axis=0, dtype=np.float32)
+    x, y, _, positions = clean_telemetry(prepared['x'], prepared['y'], combined, np.arange(len(combined)))
+    if len(x) == 0:
+        st.error(f"No valid data points available for {', '.join(channel_values)} visualization")
+        return None
+    positions = positions.astype(np.int64)
+    d = prepared['distance'][positions]
     
-    # Ensure data is sorted by distance for proper line connection
-    if 'Distance' in telemetry_clean.columns:
-        sort_idx = telemetry_clean['Distance'].argsort()
-        telemetry_clean = telemetry_clean.iloc[sort_idx].reset_index(drop=True)
-        color_col_clean = color_col_clean.iloc[sort_idx].reset_index(drop=True)
-    else:
-        # Reset index if no distance column
-        telemetry_clean = telemetry_clean.reset_index(drop=True)
-        color_col_clean = color_col_clean.reset_index(drop=True)
+    # Downsample before handing the trace to Plotly. With several channels the indices are
+    # picked on the track shape only, so all of them share one set of points
+    single_values = combined[positions] if len(channel_values) == 1 else None
+    keep_idx = positions[racing_line_indices(x, y, single_values, distance=d)]
+    x, y = prepared['x'][keep_idx], prepared['y'][keep_idx]
+    step = max(1, len(x) // HOVER_OVERLAY_POINTS)
+    
+    # Per channel: the properties that change when it's selected in the dropdown
+    channel_styles = []
+    for color_by, (values, title) in channel_values.items():
+        _, color_label, colorscale = COLOR_CHANNELS[color_by]
+        discrete = color_by in DISCRETE_CHANNELS
+        color_range = DISCRETE_CHANNELS.get(color_by)
+        color_list, cmin, cmax = marker_colors(values[keep_idx], discrete, color_range)
+        channel_styles.append(dict(
+            label=color_by,
+            title=title,
+            color_label=color_label,
+            colorscale=colorscale,
+            colors=color_list,
+            cmin=cmin,
+            cmax=cmax,
+            dtick=1 if color_range is not None else None,  # one colorbar tick per gear band
+            hovertemplate=hover_template(color_label, discrete),
+        ))
     
-    # Create the plot
+    first = channel_styles[0]
     fig = go.Figure()
     
-    # Add racing line with color mapping - use larger markers and thicker lines
-    fig.add_trace(go.Scatter(
-        x=telemetry_clean['X'],
-        y=telemetry_clean['Y'],
-        mode='markers+lines',
+    # Add racing line with color mapping. Plotly can't color a line per point, so the
+    # racing line is drawn as color-mapped markers only, without the grey line underneath
+    # WebGL trace for the dense racing line; rounded plain lists keep the JSON payload small
+    fig.add_trace(scattergl(
+        x=to_plot_list(x),
+        y=to_plot_list(y),
+        mode='markers',
         marker=dict(
             size=8,  # Increased from 5 to 8
-            color=color_col_clean,
-            colorscale=colorscale,
+            color=first['colors'],
+            colorscale=first['colorscale'],
             showscale=True,
             colorbar=dict(
                 title=dict(
-                    text=color_label,
+                    text=first['color_label'],
                     font=dict(size=14)
                 ),
                 len=0.7,  # Increased colorbar length
                 thickness=25,  # Thicker colorbar
-                tickfont=dict(size=12)
+                tickfont=dict(size=12),
+                dtick=first['dtick']
             ),
-            line=dict(width=0.5, color='rgba(0,0,0,0.3)'),
-            cmin=color_col_clean.min(),
-            cmax=color_col_clean.max()
-        ),
-        line=dict(
-            width=4,  # Increased from 3 to 4
-            color='rgba(128,128,128,0.3)'
+            cmin=first['cmin'],
+            cmax=first['cmax']
         ),
         name='Racing Line',
-        hovertemplate='<b>Position</b><br>' +
-                      'X: %{x:.1f}m<br>' +
-                      'Y: %{y:.1f}m<br>' +
-                      f'{color_label}: %{{marker.color:.1f}}<extra></extra>',
-        connectgaps=False
+        hoverinfo='skip'
     ))
     
-    # Add start/finish line marker - larger
-    if len(telemetry_clean) > 0:
-        track_x = telemetry_clean['X'].values
-        track_y = telemetry_clean['Y'].values
+    # Hover is served by a sparse invisible overlay so hit-testing doesn't scan every point
+    if hover:
+        fig.add_trace(scattergl(
+            x=to_plot_list(x[::step]),
+            y=to_plot_list(y[::step]),
+            customdata=first['colors'][::step],
+            mode='markers',
+            marker=dict(size=10, color='rgba(0,0,0,0)'),
+            showlegend=False,
+            name=first['color_label'],
+            hovertemplate=first['hovertemplate']
+        ))
+    
+    style_racing_line_figure(fig, x, y, first['title'], height, width, hover)
+    
+    if len(channel_styles) > 1:
+        buttons = []
+        for style in channel_styles:
+            # Restyle the racing line (trace 0), including its colorbar, and with hover on the
+            # overlay (trace 1); plain values apply to both traces, lists hold one value per trace
+            restyle = {
+                'marker.color': [style['colors']],
+                'marker.colorscale': [style['colorscale']],
+                'marker.cmin': style['cmin'],
+                'marker.cmax': style['cmax'],
+                'marker.colorbar.title.text': style['color_label'],
+                # None resets dtick to automatic ticks for the continuous channels
+                'marker.colorbar.dtick': style['dtick'],
+            }
+            traces = [0]
+            if hover:
+                restyle['marker.color'].append('rgba(0,0,0,0)')
+                restyle['customdata'] = [None, style['colors'][::step]]
+                restyle['hovertemplate'] = [None, style['hovertemplate']]
+                restyle['name'] = ['Racing Line', style['color_label']]
+                traces.append(1)
+            buttons.append(dict(
+                label=style['label'],
+                method='update',
+                args=[restyle, {'title.text': style['title']}, traces]
+            ))
+        
+        fig.update_layout(updatemenus=[dict(
+            buttons=buttons,
+            direction='down',
+            showactive=True,
+            x=1.0,
+            xanchor='right',
+            y=1.08,
+            yanchor='top'
+        )])
+    
+    return fig
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_channel_heatmaps(telemetry_key, channels, titles, height, width, hover, _telemetry, _prepared):
+    """
+    Cached plot_channel_heatmaps; telemetry_key (session api_path, driver) identifies the telemetry
+    """
+    return plot_channel_heatmaps(_telemetry, channels, titles, height=height, width=width, prepared=_prepared, hover=hover)
+
+
+def channel_color_column(telemetry, color_by):
+    """
+    Telemetry values to color a racing line by, with the per-channel sanity checks
+    
+    Parameters:
+    - telemetry: Telemetry DataFrame
+    - color_by: Key of COLOR_CHANNELS
+    
+    Returns:
+    - Series of color values, or None if the channel is missing
+    """
+    column = COLOR_CHANNELS[color_by][0]
+    if column not in telemetry.columns:
+        st.error(f"{color_by} data not available in telemetry. Available columns: " + ", ".join(telemetry.columns.tolist()[:10]))
+        return None
+    
+    color_col = telemetry[column]
+    
+    if color_by == "Brake":
+        # Check if brake data is meaningful (not all zeros)
+        if color_col.max() == 0:
+            st.warning("Brake data appears to be all zeros. This might indicate the data source doesn't include brake telemetry for this session.")
+    elif color_by == "DRS":
+        # Normalize DRS data if it's boolean (0/1) to percentage (0-100)
+        if color_col.max() <= 1 and color_col.min() >= 0:
+            color_col = color_col * 100
         
+        # Check if DRS data is meaningful (not all zeros)
+        if color_col.max() == 0:
+            st.warning("DRS data appears to be all zeros. This might indicate the data source doesn't include DRS telemetry for this session.")
+    
+    return color_col
+
+
+def marker_colors(c, discrete=False, color_range=None):
+    """
+    Marker color payload for already cleaned and downsampled color values
+    
+    Parameters:
+    - c: Color values
+    - discrete: Values are integers (gear, DRS state) and are sent as int8
+    - color_range: Optional fixed (cmin, cmax); defaults to the data range
+    
+    Returns:
+    - Tuple of (plain list of colors, cmin, cmax)
+    """
+    if discrete:
+        # Cleaning already dropped the NaNs, so the cast is safe; ints serialize as "3" instead of "3.0"
+        c = np.rint(c).astype(np.int8)
+        color_list = c.tolist()
+    else:
+        color_list = to_plot_list(c)
+    cmin, cmax = color_range if color_range is not None else (float(c.min()), float(c.max()))
+    return color_list, cmin, cmax
+
+
+def hover_template(color_label, discrete=False):
+    """Hover text for the sparse hover overlay of a racing line heatmap"""
+    return ('<b>Position</b><br>' +
+            'X: %{x:.1f}m<br>' +
+            'Y: %{y:.1f}m<br>' +
+            f'{color_label}: %{{customdata:.{0 if discrete else 1}f}}<extra></extra>')
+
+
+def style_racing_line_figure(fig, x, y, title, height, width, hover):
+    """Add the start/finish marker and the shared layout of the racing line heatmaps"""
+    # Add start/finish line marker - larger
+    if len(x) > 0:
         fig.add_trace(go.Scatter(
-            x=[track_x[0]],
-            y=[track_y[0]],
+            x=[float(x[0])],
+            y=[float(y[0])],
             mode='markers',
             marker=dict(size=30, symbol='star', color='red', line=dict(width=3, color='white')),  # Increased size
             name='Start/Finish',
@@ -332,7 +804,7 @@ def plot_racing_line_heatmap(telemetry, title="Racing Line Heatmap", color_by="S
         yaxis_title=dict(text="Y Position (m)", font=dict(size=14)),
         template='plotly_white',
         showlegend=True,
-        hovermode='closest',
+        hovermode='closest' if hover else False,
         height=height,  # Use parameter
         width=width,    # Use parameter
         margin=dict(l=80, r=150, t=120, b=80),  # Increased right margin for colorbar
@@ -351,11 +823,13 @@ def plot_racing_line_heatmap(telemetry, title="Racing Line Heatmap", color_by="S
     
     # Set equal aspect ratio for proper track shape
     fig.update_yaxes(scaleanchor="x", scaleratio=1)
-    
-    return fig
 
 
-def plot_driver_comparison(session, driver_codes, height=1000, width=1200):
+# Line colors for the driver comparison, reused in order
+DRIVER_COLORS = ('#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E2')
+
+
+def plot_driver_comparison(session, driver_codes, height=1000, width=1200, hover=True):
     """
     Compare multiple drivers on the same track - FIXED VERSION
     
@@ -364,6 +838,7 @@ def plot_driver_comparison(session, driver_codes, height=1000, width=1200):
     - driver_codes: List of driver codes to compare
     - height: Plot height
     - width: Plot width
+    - hover: Show hover tooltips
     
     Returns:
     - Plotly figure object
@@ -374,22 +849,21 @@ def plot_driver_comparison(session, driver_codes, height=1000, width=1200):
     
     fig = go.Figure()
     
-    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E2']
+    results = fetch_fastest_lap_telemetry([(session, code) for code in driver_codes], channels=('X', 'Y'))
     
     drivers_found = 0
-    for idx, driver_code in enumerate(driver_codes):
-        telemetry = get_fastest_lap_telemetry(session, driver_code)
+    for idx, (driver_code, telemetry) in enumerate(zip(driver_codes, results)):
         if telemetry is not None and len(telemetry) > 0:
             # Validate X and Y columns exist
             if 'X' in telemetry.columns and 'Y' in telemetry.columns:
                 drivers_found += 1
-                fig.add_trace(go.Scatter(
-                    x=telemetry['X'],
-                    y=telemetry['Y'],
-                    mode='lines+markers',
+                telemetry = downsample_racing_line(telemetry)
+                fig.add_trace(scattergl(
+                    x=to_plot_list(telemetry['X']),
+                    y=to_plot_list(telemetry['Y']),
+                    mode='lines',
                     name=f"{driver_code}",
-                    line=dict(width=5, color=colors[idx % len(colors)]),  # Thicker lines
-                    marker=dict(size=6, color=colors[idx % len(colors)]),
+                    line=dict(width=5, color=DRIVER_COLORS[idx % len(DRIVER_COLORS)]),  # Thicker lines
                     hovertemplate=f'<b>{driver_code}</b><br>' +
                                  'X: %{x:.1f}m<br>' +
                                  'Y: %{y:.1f}m<extra></extra>'
@@ -416,7 +890,7 @@ def plot_driver_comparison(session, driver_codes, height=1000, width=1200):
         height=height,
         template='plotly_white',
         showlegend=True,
-        hovermode='closest',
+        hovermode='closest' if hover else False,
         legend=dict(
             font=dict(size=16),
             orientation="v",
@@ -459,37 +933,25 @@ def plot_sector_delta(session, driver_code):
         if len(sector_times) == 0:
             return None
         
-        # Convert sector times to seconds for easier comparison
-        def time_to_seconds(time_val):
-            if pd.isna(time_val):
-                return np.nan
-            return time_val.total_seconds()
-        
-        sector_times['S1_sec'] = sector_times['Sector1Time'].apply(time_to_seconds)
-        sector_times['S2_sec'] = sector_times['Sector2Time'].apply(time_to_seconds)
-        sector_times['S3_sec'] = sector_times['Sector3Time'].apply(time_to_seconds)
-        
-        # Calculate deltas from best sector time
-        best_s1 = sector_times['S1_sec'].min()
-        best_s2 = sector_times['S2_sec'].min()
-        best_s3 = sector_times['S3_sec'].min()
+        # Convert all three sector times to seconds in one pass (NaT rows were dropped above)
+        sector_secs = sector_times[['Sector1Time', 'Sector2Time', 'Sector3Time']].to_numpy(dtype='timedelta64[ns]').view(np.int64) / 1e9
         
-        sector_times['S1_delta'] = sector_times['S1_sec'] - best_s1
-        sector_times['S2_delta'] = sector_times['S2_sec'] - best_s2
-        sector_times['S3_delta'] = sector_times['S3_sec'] - best_s3
+        # Calculate deltas from best sector time (float32 once the large absolute times are gone)
+        sector_times[['S1_delta', 'S2_delta', 'S3_delta']] = (sector_secs - sector_secs.min(axis=0)).astype(np.float32)
         
         # Create subplot
         fig = make_subplots(
             rows=3, cols=1,
+            shared_xaxes=True,  # One lap axis instead of three independent ones
             subplot_titles=('Sector 1 Delta', 'Sector 2 Delta', 'Sector 3 Delta'),
-            vertical_spacing=0.1
+            vertical_spacing=0.06
         )
         
         # Plot each sector
         fig.add_trace(
-            go.Scatter(
+            scattergl(
                 x=sector_times['LapNumber'],
-                y=sector_times['S1_delta'],
+                y=to_plot_list(sector_times['S1_delta'], decimals=3),
                 mode='lines+markers',
                 name='Sector 1',
                 line=dict(color='red', width=2),
@@ -499,9 +961,9 @@ def plot_sector_delta(session, driver_code):
         )
         
         fig.add_trace(
-            go.Scatter(
+            scattergl(
                 x=sector_times['LapNumber'],
-                y=sector_times['S2_delta'],
+                y=to_plot_list(sector_times['S2_delta'], decimals=3),
                 mode='lines+markers',
                 name='Sector 2',
                 line=dict(color='blue', width=2),
@@ -511,9 +973,9 @@ def plot_sector_delta(session, driver_code):
         )
         
         fig.add_trace(
-            go.Scatter(
+            scattergl(
                 x=sector_times['LapNumber'],
-                y=sector_times['S3_delta'],
+                y=to_plot_list(sector_times['S3_delta'], decimals=3),
                 mode='lines+markers',
                 name='Sector 3',
                 line=dict(color='green', width=2),
@@ -535,12 +997,13 @@ def plot_sector_delta(session, driver_code):
         )
         
         return fig
-    except Exception as e:
+    except LOAD_ERRORS as e:
+        logger.debug("Sector delta plot for %s failed", driver_code, exc_info=True)
         st.error(f"Error creating sector delta plot: {str(e)}")
         return None
 
 
-def plot_qualifying_vs_race(session_qualifying, session_race, driver_code, height=600, width=700):
+def plot_qualifying_vs_race(session_qualifying, session_race, driver_code, height=600, width=700, hover=True):
     """
     Compare qualifying vs race lap - FIXED VERSION
     
@@ -550,6 +1013,7 @@ def plot_qualifying_vs_race(session_qualifying, session_race, driver_code, heigh
     - driver_code: Driver code
     - height: Plot height
     - width: Plot width
+    - hover: Show hover tooltips
     
     Returns:
     - Plotly figure object
@@ -566,18 +1030,21 @@ def plot_qualifying_vs_race(session_qualifying, session_race, driver_code, heigh
     
     has_data = False
     
-    # Get qualifying telemetry
-    qual_telemetry = get_fastest_lap_telemetry(session_qualifying, driver_code)
+    # Get qualifying and race telemetry
+    qual_telemetry, race_telemetry = fetch_fastest_lap_telemetry(
+        [(session_qualifying, driver_code), (session_race, driver_code)], channels=('X', 'Y')
+    )
+    
     if qual_telemetry is not None and len(qual_telemetry) > 0:
         if 'X' in qual_telemetry.columns and 'Y' in qual_telemetry.columns:
             has_data = True
-            fig.add_trace(go.Scatter(
-                x=qual_telemetry['X'],
-                y=qual_telemetry['Y'],
-                mode='lines+markers',
+            qual_telemetry = downsample_racing_line(qual_telemetry)
+            fig.add_trace(scattergl(
+                x=to_plot_list(qual_telemetry['X']),
+                y=to_plot_list(qual_telemetry['Y']),
+                mode='lines',
                 name=f"{driver_code} - Qualifying",
                 line=dict(width=5, color='#9B59B6', dash='dash'),  # Purple, thicker
-                marker=dict(size=6, color='#9B59B6'),
                 hovertemplate='<b>Qualifying</b><br>' +
                              'X: %{x:.1f}m<br>' +
                              'Y: %{y:.1f}m<extra></extra>'
@@ -587,18 +1054,16 @@ def plot_qualifying_vs_race(session_qualifying, session_race, driver_code, heigh
     else:
         st.warning(f"Could not load qualifying telemetry for {driver_code}")
     
-    # Get race telemetry
-    race_telemetry = get_fastest_lap_telemetry(session_race, driver_code)
     if race_telemetry is not None and len(race_telemetry) > 0:
         if 'X' in race_telemetry.columns and 'Y' in race_telemetry.columns:
             has_data = True
-            fig.add_trace(go.Scatter(
-                x=race_telemetry['X'],
-                y=race_telemetry['Y'],
-                mode='lines+markers',
+            race_telemetry = downsample_racing_line(race_telemetry)
+            fig.add_trace(scattergl(
+                x=to_plot_list(race_telemetry['X']),
+                y=to_plot_list(race_telemetry['Y']),
+                mode='lines',
                 name=f"{driver_code} - Race",
                 line=dict(width=5, color='#E67E22'),  # Orange, thicker
-                marker=dict(size=6, color='#E67E22'),
                 hovertemplate='<b>Race</b><br>' +
                              'X: %{x:.1f}m<br>' +
                              'Y: %{y:.1f}m<extra></extra>'
@@ -625,7 +1090,7 @@ def plot_qualifying_vs_race(session_qualifying, session_race, driver_code, heigh
         height=height,
         template='plotly_white',
         showlegend=True,
-        hovermode='closest',
+        hovermode='closest' if hover else False,
         legend=dict(
             font=dict(size=16),
             orientation="v",
@@ -645,6 +1110,106 @@ def plot_qualifying_vs_race(session_qualifying, session_race, driver_code, heigh
     return fig
 
 
+# Additional telemetry maps: viz name -> (toggle label, title format, column that must be present or None)
+VIZ_SPECS = {
+    "Throttle": ("Show Throttle Heatmap", "{viz} - {driver}", None),
+    "Brake": ("Show Brake Zones", "{viz} Zones - {driver}", 'Brake'),
+    "Gear": ("Show Gear Usage", "{viz} Usage - {driver}", None),
+    "DRS": ("Show DRS Map", "{viz} Map - {driver}", 'DRS'),
+}
+
+
+# Each visualization block is a fragment, so toggling its checkbox only reruns that block
+@st.fragment
+def render_speed_heatmap(telemetry, prepared, telemetry_key, primary_driver, hover):
+    """Main speed heatmap for the primary driver"""
+    # Main speed heatmap - smaller size
+    st.subheader(f"🏁 Racing Line - {primary_driver}")
+    fig_speed = build_racing_line_heatmap(telemetry_key, f"Speed Heatmap - {primary_driver}", "Speed", 600, 700, hover, telemetry, prepared)
+    if fig_speed:
+        st.plotly_chart(fig_speed, use_container_width=True)
+
+
+@st.fragment
+def render_additional_telemetry(telemetry, prepared, telemetry_key, primary_driver, hover):
+    """Optional throttle/brake/gear/DRS maps for the primary driver, shown as one switchable figure"""
+    # Collect all visualizations to show in order
+    toggle_cols = st.columns(len(VIZ_SPECS))
+    viz_list = [viz_name for toggle_col, (viz_name, (toggle_label, _, _)) in zip(toggle_cols, VIZ_SPECS.items())
+                if toggle_col.checkbox(toggle_label, value=False)]
+    
+    if not viz_list:
+        return
+    
+    st.subheader("Additional Telemetry Visualizations")
+    
+    channels = []
+    titles = []
+    for viz_name in viz_list:
+        _, title_fmt, required_col = VIZ_SPECS[viz_name]
+        # Brake/DRS column names are normalized when telemetry is loaded, so one lookup is enough
+        if required_col is not None and required_col not in telemetry.columns:
+            st.error(f"{viz_name} data is not available in the telemetry for this session.")
+            continue
+        channels.append(viz_name)
+        titles.append(title_fmt.format(viz=viz_name, driver=primary_driver))
+    
+    if not channels:
+        return
+    
+    # One colorbar, relabelled by the dropdown, so the colors stay readable with hover off
+    fig = build_channel_heatmaps(telemetry_key, tuple(channels), tuple(titles), 800, 900, hover, telemetry, prepared)
+    if fig:
+        st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def render_driver_comparison(race_session, driver_codes, hover):
+    """Racing line comparison of all entered drivers"""
+    if not st.checkbox("Driver Comparison", value=False):
+        return
+    
+    st.subheader("Driver Comparison")
+    if len(driver_codes) < 2:
+        st.info("Enter multiple driver codes separated by commas (e.g., VER, HAM, LEC) to compare them.")
+    else:
+        fig_compare = plot_driver_comparison(race_session, driver_codes, height=1000, width=1200, hover=hover)
+        if fig_compare:
+            st.plotly_chart(fig_compare, use_container_width=True)
+
+
+@st.fragment
+def render_sector_delta(race_session, primary_driver):
+    """Sector-wise lap delta for the primary driver"""
+    if not st.checkbox("Sector-wise Delta", value=False):
+        return
+    
+    st.subheader(f"Sector-wise Lap Delta - {primary_driver}")
+    fig_sector = plot_sector_delta(race_session, primary_driver)
+    if fig_sector:
+        st.plotly_chart(fig_sector, use_container_width=True)
+    else:
+        st.warning(f"Sector delta data not available for {primary_driver}")
+
+
+@st.fragment
+def render_qualifying_vs_race(race_session, race_round, primary_driver, hover):
+    """Qualifying vs race fastest lap for the primary driver"""
+    if not st.checkbox("Qualifying vs Race", value=False):
+        return
+    
+    st.subheader(f"Qualifying vs Race - {primary_driver}")
+    # Qualifying is loaded on demand; the session loader is cached, so this only hits FastF1 once
+    with st.spinner("⏳ Loading qualifying data..."):
+        qual_session = load_race_session(*race_round, 'Q')
+    if qual_session is not None:
+        fig_qual_race = plot_qualifying_vs_race(qual_session, race_session, primary_driver, height=600, width=700, hover=hover)
+        if fig_qual_race:
+            st.plotly_chart(fig_qual_race, use_container_width=True)
+    else:
+        st.warning("Could not load qualifying session. Qualifying vs Race comparison is not available.")
+
+
 # Main App
 def main():
     st.markdown('<h1 class="main-header">F1 Telemetry Analytics Dashboard</h1>', unsafe_allow_html=True)
@@ -662,21 +1227,19 @@ def main():
         )
         
         # Race selection
-        schedule = get_race_schedule(selected_year)
-        if schedule is not None and len(schedule) > 0:
-            race_options = []
-            for idx, row in schedule.iterrows():
-                race_display = f"Round {row['RoundNumber']}: {row['Location']} ({row['EventName']})"
-                race_options.append((race_display, row['RoundNumber']))
-            
-            race_display_names = [opt[0] for opt in race_options]
+        race_options = get_race_options(selected_year)
+        if race_options:
+            race_display_names, round_lookup = race_options
             selected_race_display = st.selectbox(
                 "Select Race",
                 options=race_display_names,
                 index=0
             )
-            selected_round = [opt[1] for opt in race_options if opt[0] == selected_race_display][0]
+            selected_round = round_lookup[selected_race_display]
         else:
+            # Don't keep a failed schedule fetch cached for the whole TTL
+            get_race_schedule.clear()
+            get_race_options.clear()
             st.error("Could not load race schedule. Please check your internet connection.")
             st.stop()
         
@@ -696,13 +1259,8 @@ def main():
         
         # Visualization options
         st.header("Visualization Options")
-        show_throttle = st.checkbox("Show Throttle Heatmap", value=False)
-        show_brake = st.checkbox("Show Brake Zones", value=False)
-        show_gear = st.checkbox("Show Gear Usage", value=False)
-        show_drs = st.checkbox("Show DRS Map", value=False)
-        show_comparison = st.checkbox("Driver Comparison", value=False)
-        show_sector_delta = st.checkbox("Sector-wise Delta", value=False)
-        show_qual_vs_race = st.checkbox("Qualifying vs Race", value=False)
+        enable_hover = st.checkbox("Enable hover", value=False,
+                                   help="Show tooltips on track maps. Slower to interact with on large plots.")
     
     # Main content area
     if load_button or st.session_state.race_data is not None:
@@ -715,15 +1273,7 @@ def main():
                     st.stop()
                 
                 st.session_state.race_data = race_session
-                
-                # Load qualifying session if comparison is requested
-                if show_qual_vs_race:
-                    with st.spinner("⏳ Loading qualifying data..."):
-                        qual_session = load_race_session(selected_year, selected_round, 'Q')
-                        if qual_session is not None:
-                            st.session_state.qualifying_data = qual_session
-                        else:
-                            st.warning("Could not load qualifying session. Qualifying vs Race comparison will not be available.")
+                st.session_state.race_round = (selected_year, selected_round)
         
         race_session = st.session_state.race_data
         
@@ -746,156 +1296,21 @@ def main():
             
             if telemetry is None:
                 st.error(f"Could not load telemetry for {primary_driver}")
+            elif 'X' not in telemetry.columns or 'Y' not in telemetry.columns:
+                st.error("Telemetry data missing X or Y coordinates")
             else:
-                # Main speed heatmap - smaller size
-                st.subheader(f"🏁 Racing Line - {primary_driver}")
-                fig_speed = plot_racing_line_heatmap(telemetry, f"Speed Heatmap - {primary_driver}", "Speed", width=700, height=600)
-                if fig_speed:
-                    st.plotly_chart(fig_speed, use_container_width=True)
+                # Position data is cleaned once and shared by every heatmap below
+                prepared = prepare_telemetry(telemetry)
                 
-                # Optional visualizations - show all selected in pairs of 2 side by side
-                optional_viz_count = sum([show_throttle, show_brake, show_gear, show_drs])
+                # Identifies this lap's telemetry for the figure cache
+                telemetry_key = (race_session.api_path, primary_driver)
                 
-                if optional_viz_count > 0:
-                    st.subheader("Additional Telemetry Visualizations")
-                    
-                    # Collect all visualizations to show in order
-                    viz_list = []
-                    if show_throttle:
-                        viz_list.append(("Throttle", "", "Throttle"))
-                    if show_brake:
-                        viz_list.append(("Brake", "", "Brake"))
-                    if show_gear:
-                        viz_list.append(("Gear", "", "Gear"))
-                    if show_drs:
-                        viz_list.append(("DRS", "", "DRS"))
-                    
-                    # Display in pairs of 2 maps side by side
-                    for i in range(0, len(viz_list), 2):
-                        cols = st.columns(2)
-                        
-                        # First visualization in the pair
-                        with cols[0]:
-                            viz_name, icon, color_by = viz_list[i]
-                            st.subheader(f"{icon} {viz_name} - {primary_driver}" if viz_name != "Gear" else f"{icon} {viz_name} Usage - {primary_driver}")
-                            
-                            if viz_name == "Brake":
-                                # Check if brake data exists
-                                if telemetry is not None:
-                                    has_brake = ('Brake' in telemetry.columns or 
-                                                'BR' in telemetry.columns or 
-                                                any('brake' in col.lower() for col in telemetry.columns))
-                                    if has_brake:
-                                        fig = plot_racing_line_heatmap(telemetry, f"{viz_name} Zones - {primary_driver}", color_by, width=900, height=800)
-                                        if fig:
-                                            st.plotly_chart(fig, use_container_width=True)
-                                        else:
-                                            st.warning("Could not generate brake visualization. The brake data may be invalid or empty.")
-                                    else:
-                                        st.error(f"Brake data is not available in the telemetry for this session.")
-                                else:
-                                    st.error("No telemetry data available")
-                            elif viz_name == "DRS":
-                                # Check if DRS data exists
-                                if telemetry is not None:
-                                    has_drs = ('DRS' in telemetry.columns or 
-                                              'drs' in telemetry.columns or 
-                                              any('drs' in col.lower() for col in telemetry.columns))
-                                    if has_drs:
-                                        fig = plot_racing_line_heatmap(telemetry, f"{viz_name} Map - {primary_driver}", color_by, width=900, height=800)
-                                        if fig:
-                                            st.plotly_chart(fig, use_container_width=True)
-                                        else:
-                                            st.warning("Could not generate DRS visualization. The DRS data may be invalid or empty.")
-                                    else:
-                                        st.error(f"DRS data is not available in the telemetry for this session.")
-                                else:
-                                    st.error("No telemetry data available")
-                            else:
-                                # Throttle or Gear - no special checks needed
-                                title = f"{viz_name} - {primary_driver}" if viz_name != "Gear" else f"{viz_name} Usage - {primary_driver}"
-                                fig = plot_racing_line_heatmap(telemetry, title, color_by, width=900, height=800)
-                                if fig:
-                                    st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Second visualization in the pair (if exists)
-                        if i + 1 < len(viz_list):
-                            with cols[1]:
-                                viz_name, icon, color_by = viz_list[i + 1]
-                                st.subheader(f"{icon} {viz_name} - {primary_driver}" if viz_name != "Gear" else f"{icon} {viz_name} Usage - {primary_driver}")
-                                
-                                if viz_name == "Brake":
-                                    # Check if brake data exists
-                                    if telemetry is not None:
-                                        has_brake = ('Brake' in telemetry.columns or 
-                                                    'BR' in telemetry.columns or 
-                                                    any('brake' in col.lower() for col in telemetry.columns))
-                                        if has_brake:
-                                            fig = plot_racing_line_heatmap(telemetry, f"{viz_name} Zones - {primary_driver}", color_by, width=900, height=800)
-                                            if fig:
-                                                st.plotly_chart(fig, use_container_width=True)
-                                            else:
-                                                st.warning("Could not generate brake visualization. The brake data may be invalid or empty.")
-                                        else:
-                                            st.error(f"Brake data is not available in the telemetry for this session.")
-                                    else:
-                                        st.error("No telemetry data available")
-                                elif viz_name == "DRS":
-                                    # Check if DRS data exists
-                                    if telemetry is not None:
-                                        has_drs = ('DRS' in telemetry.columns or 
-                                                  'drs' in telemetry.columns or 
-                                                  any('drs' in col.lower() for col in telemetry.columns))
-                                        if has_drs:
-                                            fig = plot_racing_line_heatmap(telemetry, f"{viz_name} Map - {primary_driver}", color_by, width=900, height=800)
-                                            if fig:
-                                                st.plotly_chart(fig, use_container_width=True)
-                                            else:
-                                                st.warning("Could not generate DRS visualization. The DRS data may be invalid or empty.")
-                                        else:
-                                            st.error(f"DRS data is not available in the telemetry for this session.")
-                                    else:
-                                        st.error("No telemetry data available")
-                                else:
-                                    # Throttle or Gear - no special checks needed
-                                    title = f"{viz_name} - {primary_driver}" if viz_name != "Gear" else f"{viz_name} Usage - {primary_driver}"
-                                    fig = plot_racing_line_heatmap(telemetry, title, color_by, width=900, height=800)
-                                    if fig:
-                                        st.plotly_chart(fig, use_container_width=True)
-                        else:
-                            # If odd number, leave second column empty
-                            with cols[1]:
-                                pass
-            
-            # Driver comparison - FIXED
-            if show_comparison:
-                st.subheader("Driver Comparison")
-                if len(driver_codes) < 2:
-                    st.info("Enter multiple driver codes separated by commas (e.g., VER, HAM, LEC) to compare them.")
-                else:
-                    fig_compare = plot_driver_comparison(race_session, driver_codes, height=1000, width=1200)
-                    if fig_compare:
-                        st.plotly_chart(fig_compare, use_container_width=True)
-            
-            # Sector delta
-            if show_sector_delta:
-                st.subheader(f"Sector-wise Lap Delta - {primary_driver}")
-                fig_sector = plot_sector_delta(race_session, primary_driver)
-                if fig_sector:
-                    st.plotly_chart(fig_sector, use_container_width=True)
-                else:
-                    st.warning(f"Sector delta data not available for {primary_driver}")
+                render_speed_heatmap(telemetry, prepared, telemetry_key, primary_driver, enable_hover)
+                render_additional_telemetry(telemetry, prepared, telemetry_key, primary_driver, enable_hover)
             
-            # Qualifying vs Race - FIXED
-            if show_qual_vs_race:
-                st.subheader(f"Qualifying vs Race - {primary_driver}")
-                qual_session = st.session_state.qualifying_data
-                if qual_session is not None:
-                    fig_qual_race = plot_qualifying_vs_race(qual_session, race_session, primary_driver, height=600, width=700)
-                    if fig_qual_race:
-                        st.plotly_chart(fig_qual_race, use_container_width=True)
-                else:
-                    st.warning("Qualifying session data not available. Try loading the race data again with 'Qualifying vs Race' option checked.")
+            render_driver_comparison(race_session, driver_codes, enable_hover)
+            render_sector_delta(race_session, primary_driver)
+            render_qualifying_vs_race(race_session, st.session_state.race_round, primary_driver, enable_hover)
     
     else:
         # Welcome screen
@@ -913,14 +1328,14 @@ def main():
         ###  How It Works
         
         1. **Data Fetching**: Uses the FastF1 library to fetch official F1 timing and telemetry data
-        2. **Caching**: Data is cached locally in the `cache` folder for faster subsequent loads
+        2. **Caching**: Data is cached locally in the `.fastf1_cache` folder (or `$FASTF1_CACHE`) for faster subsequent loads
         3. **Telemetry Extraction**: Extracts fastest lap telemetry for selected drivers
         4. **Visualization**: Creates interactive Plotly charts for analysis
         
         ### Tips
         
         - Enter multiple drivers separated by commas for comparison (e.g., VER, HAM, LEC)
-        - Check "Qualifying vs Race" BEFORE loading data to ensure qualifying data is loaded
+        - Toggle visualizations below the racing line; only the toggled section is re-rendered
         - The track maps now show larger with better visibility!
         """)
 
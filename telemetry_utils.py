@@ -0,0 +1,69 @@
+"""
+Telemetry preprocessing kernels
+Array-level helpers used by the dashboard's plotting code. Numba is optional:
+when it is installed the per-sample loops are JIT compiled, otherwise the
+equivalent vectorized NumPy code is used.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _clean_telemetry_numpy(x, y, c, d):
+    mask = np.isfinite(x)
+    mask &= np.isfinite(y)
+    mask &= np.isfinite(c)
+    if mask.all():
+        # Nothing to drop, so skip the gathers
+        return x, y, c, d
+    return x[mask], y[mask], c[mask], d[mask]
+
+
+def _clean_telemetry_loop(x, y, c, d):
+    n = x.shape[0]
+    out_x = np.empty(n, dtype=x.dtype)
+    out_y = np.empty(n, dtype=y.dtype)
+    out_c = np.empty(n, dtype=c.dtype)
+    out_d = np.empty(n, dtype=d.dtype)
+
+    # Single fused pass: check and compact every sample at once
+    k = 0
+    for i in range(n):
+        if np.isfinite(x[i]) and np.isfinite(y[i]) and np.isfinite(c[i]):
+            out_x[k] = x[i]
+            out_y[k] = y[i]
+            out_c[k] = c[i]
+            out_d[k] = d[i]
+            k += 1
+
+    return out_x[:k], out_y[:k], out_c[:k], out_d[:k]
+
+
+if njit is not None:
+    # No fastmath: it lets the compiler assume NaN never occurs, which breaks the isfinite checks
+    _clean_telemetry = njit(cache=True)(_clean_telemetry_loop)
+else:
+    _clean_telemetry = _clean_telemetry_numpy
+
+
+def clean_telemetry(x, y, c, d):
+    """
+    Drop samples where position or the color channel is missing
+
+    Parameters:
+    - x, y: Position arrays
+    - c: Color channel values
+    - d: Distance values (kept aligned with the other arrays)
+
+    Returns:
+    - Tuple of filtered (x, y, c, d) float32 arrays, in their original order
+    """
+    return _clean_telemetry(
+        np.ascontiguousarray(x, dtype=np.float32),
+        np.ascontiguousarray(y, dtype=np.float32),
+        np.ascontiguousarray(c, dtype=np.float32),
+        np.ascontiguousarray(d, dtype=np.float32),
+    )